@@ -3,24 +3,24 @@ import sys
 import os
 import argparse
 import math  # For tile calculations
-import collections  # For moving average deque
-from flask import Flask, render_template, request, send_file, jsonify
-from flask_socketio import SocketIO, emit
+import collections  # For rolling metrics deques
 import mercantile
 import requests
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import zipfile
+import io
 import random
 import shutil
 import re
 import time
 import json
-from shapely.geometry import Polygon, box
-from shapely.ops import unary_union
 import threading
-from PIL import Image
-from pathlib import Path
+from urllib.parse import urlsplit
+
+## Note: Flask, flask_socketio, shapely and PIL are imported lazily inside the
+## functions that need them, so CLI runs do not pay for the web server and
+## geometry stack. Enforced by: python utils/check_import_time.py
 
 # Base directory for caching tiles, absolute path relative to script location
 BASE_DIR = Path(__file__).parent.parent  # Root of map-tile-downloader
@@ -43,20 +43,26 @@ DOWNLOADS_DIR.mkdir(exist_ok=True)
 ## Install dependencies on startup if not already installed
 # install_dependencies()
 
-app = Flask(__name__, template_folder='../templates')
-socketio = SocketIO(app)
+# Flask app and SocketIO server, only created by create_web_app() for web mode
+app = None
+socketio = None
 
 
-# Load map sources from config file
-CONFIG_DIR = Path('config')
+# Map sources config, resolved from the project root rather than the CWD
+CONFIG_DIR = BASE_DIR / 'config'
 MAP_SOURCES_FILE = CONFIG_DIR / 'map_sources.json'
-MAP_SOURCES = {}
-if MAP_SOURCES_FILE.exists():
-    with open(MAP_SOURCES_FILE, 'r') as f:
-        MAP_SOURCES = json.load(f)
-else:
-    print("Warning: map_sources.json not found. No map sources available.")
-    sys.exit(1)
+_map_sources = None
+
+def load_map_sources():
+    """Load map sources from the config file on first use and cache them."""
+    global _map_sources
+    if _map_sources is None:
+        if not MAP_SOURCES_FILE.exists():
+            print("Warning: map_sources.json not found. No map sources available.")
+            sys.exit(1)
+        with open(MAP_SOURCES_FILE, 'r') as f:
+            _map_sources = json.load(f)
+    return _map_sources
 
 # Global event for cancellation
 download_event = threading.Event()
@@ -72,13 +78,216 @@ def get_style_cache_dir(style_name):
     sanitized_name = sanitize_style_name(style_name)
     return CACHE_DIR / sanitized_name
 
-def download_tile(tile, map_style, style_cache_dir, convert_to_8bit, max_retries=3):
-    """Download a single tile with retries if not cancelled and not in cache, converting to 8-bit if specified."""
+# Tile formats stored in the cache, keyed by the name used on the command line
+TILE_FORMATS = {
+    "png": {"extension": ".png", "mimetype": "image/png"},
+    "webp": {"extension": ".webp", "mimetype": "image/webp"},
+    "jpeg": {"extension": ".jpg", "mimetype": "image/jpeg"},
+}
+TILE_EXTENSIONS = [tile_format["extension"] for tile_format in TILE_FORMATS.values()]
+
+def detect_tile_format(data):
+    """Detect the real image format of tile bytes from their signature, defaulting to png."""
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return "png"
+
+def get_tile_format_for_path(tile_path):
+    """Return the TILE_FORMATS key matching a cached tile's extension."""
+    for name, tile_format in TILE_FORMATS.items():
+        if tile_path.suffix == tile_format["extension"]:
+            return name
+    return "png"
+
+def find_cached_tile(tile_dir, tile_y):
+    """Return the path of a cached tile in any supported format, or None if it is not cached."""
+    for extension in TILE_EXTENSIONS:
+        tile_path = tile_dir / f"{tile_y}{extension}"
+        if tile_path.exists():
+            return tile_path
+    return None
+
+def write_tile(tile_dir, tile_y, content):
+    """Write downloaded tile bytes using the extension of their real format."""
+    tile_dir.mkdir(parents=True, exist_ok=True)
+    extension = TILE_FORMATS[detect_tile_format(content)]["extension"]
+    tile_path = tile_dir / f"{tile_y}{extension}"
+    with open(tile_path, 'wb') as f:
+        f.write(content)
+    return tile_path
+
+def convert_tile_to_8bit(tile_path):
+    """Convert a cached tile to an 8-bit palette PNG, returning its (possibly renamed) path."""
+    from PIL import Image
+    png_path = tile_path.with_suffix('.png')
+    with Image.open(tile_path) as img:
+        if img.mode == 'P':  # Only convert if not already 8-bit palette
+            return tile_path
+        img = img.quantize(colors=256)
+        img.save(png_path, 'PNG')
+    if png_path != tile_path:
+        tile_path.unlink()
+    return png_path
+
+# --- Download metrics: latency histograms, throughput and error-rate series ---
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1, 2, 5, 10]  # Upper bounds in seconds; one overflow bucket follows
+METRICS_BIN_SECONDS = 5  # Width of one time-series bin
+METRICS_SERIES_BINS = 24  # Number of bins kept per series (2 minutes)
+THROUGHPUT_WINDOW_SECONDS = 30  # Window for the throughput used by the ETA
+STATS_EMIT_INTERVAL = 2  # Seconds between download_stats pushes to the web UI
+
+def get_source_host(map_style):
+    """Return the host of a tile URL template, with any {s} subdomain placeholder removed."""
+    return urlsplit(map_style).netloc.replace('{s}.', '')
+
+class TileMetrics:
+    """Thread-safe rolling latency histograms, throughput and error-rate series per host and zoom level.
+
+    Request attempts (including failed retries) feed the per-host and per-zoom groups, while finished
+    tiles are counted separately so that progress and the ETA count each tile once.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.processed = 0  # Unique tiles finished (downloaded, skipped or given up)
+        self.network_processed = 0  # Finished tiles that needed a request
+        self.completions = collections.deque()  # Finish times of network-bound tiles, for the ETA rate
+        self.groups = {"hosts": {}, "zooms": {}}
+
+    def _new_group(self):
+        return {
+            "requests": 0,
+            "errors": 0,
+            "histogram": [0] * (len(LATENCY_BUCKETS) + 1),
+            "series": collections.deque(maxlen=METRICS_SERIES_BINS),  # [bin_start, responses, errors, histogram]
+        }
+
+    def record_attempt(self, host, zoom, failed, latency):
+        """Record the outcome and latency of one request attempt, including attempts that will be retried."""
+        now = time.time()
+        bin_start = int(now // METRICS_BIN_SECONDS) * METRICS_BIN_SECONDS
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))
+        with self.lock:
+            for kind, key in (("hosts", host), ("zooms", str(zoom))):
+                group = self.groups[kind].setdefault(key, self._new_group())
+                group["requests"] += 1
+                group["histogram"][bucket] += 1
+                if not group["series"] or group["series"][-1][0] != bin_start:
+                    group["series"].append([bin_start, 0, 0, [0] * (len(LATENCY_BUCKETS) + 1)])
+                current = group["series"][-1]
+                current[3][bucket] += 1
+                if failed:
+                    group["errors"] += 1
+                    current[2] += 1
+                else:
+                    current[1] += 1
+
+    def record_tile(self, network_bound):
+        """Record one finished tile; network_bound is False for tiles served from the cache."""
+        now = time.time()
+        with self.lock:
+            self.processed += 1
+            if network_bound:
+                self.network_processed += 1
+                self.completions.append(now)
+            while self.completions and self.completions[0] < now - THROUGHPUT_WINDOW_SECONDS:
+                self.completions.popleft()
+
+    def tiles_per_second(self):
+        """Wall-clock rate of network-bound tiles over the recent window, which reflects worker concurrency."""
+        with self.lock:
+            return self._tiles_per_second()
+
+    def _tiles_per_second(self):
+        window = min(THROUGHPUT_WINDOW_SECONDS, time.time() - self.start_time)
+        if window < 1 or not self.completions:
+            return 0
+        return len(self.completions) / window
+
+    def _eta_seconds(self, remaining_tiles):
+        # Cached tiles finish almost instantly, so only the expected share of uncached tiles costs time
+        rate = self._tiles_per_second()
+        if rate <= 0 or self.processed == 0:
+            return None
+        return remaining_tiles * (self.network_processed / self.processed) / rate
+
+    def eta_seconds(self, remaining_tiles):
+        """Estimated seconds for the remaining tiles at the measured throughput, or None if unknown."""
+        with self.lock:
+            return self._eta_seconds(remaining_tiles)
+
+    @staticmethod
+    def percentile(histogram, fraction):
+        """Upper bucket bound containing the given fraction of requests, or None for the overflow bucket."""
+        target = sum(histogram) * fraction
+        cumulative = 0
+        for i, count in enumerate(histogram):
+            cumulative += count
+            if count and cumulative >= target:
+                return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else None
+        return None
+
+    def summary(self, remaining_tiles=None):
+        """Return a compact JSON-serialisable summary; latency and error rates cover the rolling window."""
+        with self.lock:
+            now = time.time()
+            current_bin = int(now // METRICS_BIN_SECONDS) * METRICS_BIN_SECONDS
+            starts = [current_bin - i * METRICS_BIN_SECONDS for i in range(METRICS_SERIES_BINS - 1, -1, -1)]
+            # The current bin is only partly filled, so divide it by the time elapsed in it
+            widths = [METRICS_BIN_SECONDS] * (METRICS_SERIES_BINS - 1) + [max(now - current_bin, 1)]
+            result = {
+                "elapsed": now - self.start_time,
+                "processed": self.processed,
+                "tiles_per_second": self._tiles_per_second(),
+                "eta_seconds": self._eta_seconds(remaining_tiles) if remaining_tiles is not None else None,
+                "buckets": LATENCY_BUCKETS,
+                "bin_seconds": METRICS_BIN_SECONDS,
+                "window_seconds": METRICS_BIN_SECONDS * METRICS_SERIES_BINS,
+            }
+            for kind, groups in self.groups.items():
+                result[kind] = {}
+                for key, group in groups.items():
+                    bins = {entry[0]: entry for entry in group["series"] if entry[0] >= starts[0]}
+                    window_histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+                    for entry in bins.values():
+                        window_histogram = [a + b for a, b in zip(window_histogram, entry[3])]
+                    window_requests = sum(window_histogram)
+                    window_errors = sum(entry[2] for entry in bins.values())
+                    empty = (0, 0, 0, None)
+                    result[kind][key] = {
+                        "window_requests": window_requests,
+                        "window_errors": window_errors,
+                        "error_rate": window_errors / window_requests if window_requests else 0,
+                        "p50": self.percentile(window_histogram, 0.5),
+                        "p90": self.percentile(window_histogram, 0.9),
+                        "histogram": window_histogram,
+                        "throughput": [bins.get(start, empty)[1] / width for start, width in zip(starts, widths)],
+                        "error_series": [bins.get(start, empty)[2] for start in starts],
+                        "requests": group["requests"],
+                        "errors": group["errors"],
+                        "total_histogram": list(group["histogram"]),
+                    }
+            return result
+
+# Metrics of the current web UI download
+download_metrics = TileMetrics()
+
+def download_tile(tile, map_style, style_cache_dir, convert_to_8bit, max_retries=3, final_pass=True):
+    """Download a single tile with retries if not cancelled and not in cache, converting to 8-bit if specified.
+
+    Every request attempt is recorded in the metrics, but the tile only counts as failed when final_pass is
+    set, so tiles retried in later passes are counted once.
+    """
     if not download_event.is_set():
         return None
     tile_dir = style_cache_dir / str(tile.z) / str(tile.x)
-    tile_path = tile_dir / f"{tile.y}.png"
-    if tile_path.exists():
+    tile_path = find_cached_tile(tile_dir, tile.y)
+    host = get_source_host(map_style)
+    if tile_path:
+        download_metrics.record_tile(network_bound=False)
         bounds = mercantile.bounds(tile)
         socketio.emit('tile_skipped', {
             'west': bounds.west,
@@ -91,17 +300,15 @@ def download_tile(tile, map_style, style_cache_dir, convert_to_8bit, max_retries
     url = map_style.replace('{s}', subdomain).replace('{z}', str(tile.z)).replace('{x}', str(tile.x)).replace('{y}', str(tile.y))
     headers = {'User-Agent': 'MapTileDownloader/1.0'}
     for attempt in range(max_retries):
+        start_attempt_time = time.time()
         try:
             response = requests.get(url, headers=headers, timeout=10)
+            download_metrics.record_attempt(host, tile.z, response.status_code != 200, time.time() - start_attempt_time)
             if response.status_code == 200:
-                tile_dir.mkdir(parents=True, exist_ok=True)
-                with open(tile_path, 'wb') as f:
-                    f.write(response.content)
+                tile_path = write_tile(tile_dir, tile.y, response.content)
                 if convert_to_8bit:
-                    with Image.open(tile_path) as img:
-                        if img.mode != 'P':  # Only convert if not already 8-bit palette
-                            img = img.quantize(colors=256)
-                            img.save(tile_path)
+                    tile_path = convert_tile_to_8bit(tile_path)
+                download_metrics.record_tile(network_bound=True)
                 bounds = mercantile.bounds(tile)
                 socketio.emit('tile_downloaded', {
                     'west': bounds.west,
@@ -113,10 +320,13 @@ def download_tile(tile, map_style, style_cache_dir, convert_to_8bit, max_retries
             else:
                 time.sleep(2 ** attempt)  # Exponential backoff
         except requests.RequestException:
+            download_metrics.record_attempt(host, tile.z, True, time.time() - start_attempt_time)
             time.sleep(2 ** attempt)  # Exponential backoff
-    socketio.emit('tile_failed', {
-        'tile': f"{tile.z}/{tile.x}/{tile.y}"
-    })
+    if final_pass:
+        download_metrics.record_tile(network_bound=True)
+        socketio.emit('tile_failed', {
+            'tile': f"{tile.z}/{tile.x}/{tile.y}"
+        })
     return None
 
 def get_world_tiles():
@@ -130,6 +340,8 @@ def get_world_tiles():
 
 def get_tiles_for_polygons(polygons_data, min_zoom, max_zoom):
     """Generate list of tiles that intersect with the given polygons for the specified zoom range."""
+    from shapely.geometry import Polygon, box
+    from shapely.ops import unary_union
     polygons = [Polygon([(lng, lat) for lat, lng in poly]) for poly in polygons_data]
     overall_polygon = unary_union(polygons)
     west, south, east, north = overall_polygon.bounds
@@ -146,29 +358,50 @@ def get_tiles_for_polygons(polygons_data, min_zoom, max_zoom):
 
 def download_tiles_with_retries(tiles, map_style, style_cache_dir, convert_to_8bit):
     """Download tiles with efficient retries using parallelism and adaptive backoff."""
+    global download_metrics
     socketio.emit('download_started', {'total_tiles': len(tiles)})
     retry_queue = []
     max_workers = 5
     batch_size = 10
-
-    def process_batch(batch):
+    max_passes = 3  # Passes over failed tiles before they are given up
+    total_tiles = len(tiles)
+    download_metrics = TileMetrics()
+    stats_done = threading.Event()
+
+    def emit_stats():
+        while not stats_done.wait(STATS_EMIT_INTERVAL):
+            # Tiles are counted once when downloaded, skipped or given up, so processed counts unique tiles
+            remaining = max(total_tiles - download_metrics.processed, 0)
+            socketio.emit('download_stats', download_metrics.summary(remaining))
+
+    def process_batch(batch, final_pass):
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(download_tile, tile, map_style, style_cache_dir, convert_to_8bit): tile for tile in batch}
+            futures = {
+                executor.submit(download_tile, tile, map_style, style_cache_dir, convert_to_8bit, final_pass=final_pass): tile
+                for tile in batch
+            }
             for future in as_completed(futures):
-                if future.result() is None and download_event.is_set():
+                if future.result() is None and download_event.is_set() and not final_pass:
                     retry_queue.append(futures[future])
 
-    while tiles and download_event.is_set():
-        for i in range(0, len(tiles), batch_size):
-            if not download_event.is_set():
+    socketio.start_background_task(emit_stats)
+    try:
+        for pass_number in range(1, max_passes + 1):
+            if not tiles or not download_event.is_set():
                 break
-            batch = tiles[i:i + batch_size]
-            process_batch(batch)
-        tiles = retry_queue if retry_queue else []
-        retry_queue = []
-        if tiles:
-            delay = min(2 ** len(retry_queue), 8)
-            time.sleep(delay)
+            for i in range(0, len(tiles), batch_size):
+                if not download_event.is_set():
+                    break
+                batch = tiles[i:i + batch_size]
+                process_batch(batch, final_pass=pass_number == max_passes)
+            tiles = retry_queue if retry_queue else []
+            retry_queue = []
+            if tiles:
+                delay = min(2 ** len(retry_queue), 8)
+                time.sleep(delay)
+    finally:
+        stats_done.set()
+        socketio.emit('download_stats', download_metrics.summary(0))
 
     if download_event.is_set():
         socketio.emit('tiles_downloaded')
@@ -185,26 +418,26 @@ def create_zip(style_cache_dir, style_name):
                 zipf.write(file_path, arcname)
     return str(zip_path)  # Return as string for send_file
 
-@app.route('/')
 def index():
     """Render the main page."""
+    from flask import render_template
     return render_template('index.html')
 
-@app.route('/get_map_sources')
 def get_map_sources():
     """Return the list of map sources from the config file."""
-    return jsonify(MAP_SOURCES)
+    from flask import jsonify
+    return jsonify(load_map_sources())
 
-@socketio.on('start_download')
 def handle_start_download(data):
     """Handle download request for tiles within polygons."""
+    from flask_socketio import emit
     try:
         polygons_data = data['polygons']
         min_zoom = data['min_zoom']
         max_zoom = data['max_zoom']
         map_style_url = data['map_style']
         convert_to_8bit = data.get('convert_to_8bit', False)
-        style_name = next(name for name, url in MAP_SOURCES.items() if url == map_style_url)
+        style_name = next(name for name, url in load_map_sources().items() if url == map_style_url)
         style_cache_dir = get_style_cache_dir(style_name)
         if min_zoom < 0 or max_zoom > 19 or min_zoom > max_zoom:
             emit('error', {'message': 'Invalid zoom range (must be 0-19, min <= max)'})
@@ -222,13 +455,13 @@ def handle_start_download(data):
         print(f"Error processing download: {e}")
         emit('error', {'message': 'An error occurred while processing your request'})
 
-@socketio.on('start_world_download')
 def handle_start_world_download(data):
     """Handle download request for world basemap tiles (zoom 0-7)."""
+    from flask_socketio import emit
     try:
         map_style_url = data['map_style']
         convert_to_8bit = data.get('convert_to_8bit', False)
-        style_name = next(name for name, url in MAP_SOURCES.items() if url == map_style_url)
+        style_name = next(name for name, url in load_map_sources().items() if url == map_style_url)
         style_cache_dir = get_style_cache_dir(style_name)
         tiles = get_world_tiles()
         download_event.set()
@@ -240,30 +473,34 @@ def handle_start_world_download(data):
         print(f"Error processing world download: {e}")
         emit('error', {'message': 'An error occurred while processing your request'})
 
-@socketio.on('cancel_download')
 def handle_cancel_download():
     """Handle cancellation of the download."""
+    from flask_socketio import emit
     download_event.clear()
     emit('download_cancelled')
 
-@app.route('/download_zip')
 def download_zip():
     """Send the zip file to the user."""
+    from flask import request, send_file
     zip_path = request.args.get('path')
     while not Path(zip_path).exists():  # Wait until the file is created
         time.sleep(0.5)
     return send_file(zip_path, as_attachment=True, download_name=Path(zip_path).name)
 
-@app.route('/tiles/<style_name>/<int:z>/<int:x>/<int:y>.png')
 def serve_tile(style_name, z, x, y):
     """Serve a cached tile if it exists."""
+    from flask import send_file
     style_cache_dir = get_style_cache_dir(style_name)
-    tile_path = style_cache_dir / str(z) / str(x) / f"{y}.png"
-    if tile_path.exists():
-        return send_file(tile_path)
+    tile_path = find_cached_tile(style_cache_dir / str(z) / str(x), y)
+    if tile_path:
+        return send_file(tile_path, mimetype=TILE_FORMATS[get_tile_format_for_path(tile_path)]["mimetype"])
     return '', 404
 
-@app.route('/delete_cache/<style_name>', methods=['DELETE'])
+def get_download_stats():
+    """Return the latency, throughput and error-rate summary of the current web download."""
+    from flask import jsonify
+    return jsonify(download_metrics.summary())
+
 def delete_cache(style_name):
     """Delete the cache directory for a specific style."""
     cache_dir = get_style_cache_dir(style_name)
@@ -272,9 +509,9 @@ def delete_cache(style_name):
         return '', 204
     return 'Cache not found', 404
 
-@app.route('/get_cached_tiles/<style_name>')
 def get_cached_tiles_route(style_name):
     """Return a list of [z, x, y] for cached tiles of the given style."""
+    from flask import jsonify
     style_cache_dir = get_style_cache_dir(style_name)
     if not style_cache_dir.exists():
         return jsonify([])
@@ -287,7 +524,9 @@ def get_cached_tiles_route(style_name):
                     if x_dir.is_dir():
                         try:
                             x = int(x_dir.name)
-                            for y_file in x_dir.glob('*.png'):
+                            for y_file in x_dir.iterdir():
+                                if y_file.suffix not in TILE_EXTENSIONS:
+                                    continue
                                 try:
                                     y = int(y_file.stem)
                                     cached_tiles.append([z, x, y])
@@ -300,6 +539,28 @@ def get_cached_tiles_route(style_name):
     return jsonify(cached_tiles)
 
 
+def create_web_app():
+    """Create the Flask app and SocketIO server and register the web UI routes and events."""
+    global app, socketio
+    from flask import Flask
+    from flask_socketio import SocketIO
+
+    app = Flask(__name__, template_folder=str(BASE_DIR / 'templates'))
+    socketio = SocketIO(app)
+
+    app.add_url_rule('/', view_func=index)
+    app.add_url_rule('/get_map_sources', view_func=get_map_sources)
+    app.add_url_rule('/download_zip', view_func=download_zip)
+    app.add_url_rule('/tiles/<style_name>/<int:z>/<int:x>/<int:y>.png', view_func=serve_tile)
+    app.add_url_rule('/delete_cache/<style_name>', view_func=delete_cache, methods=['DELETE'])
+    app.add_url_rule('/get_cached_tiles/<style_name>', view_func=get_cached_tiles_route)
+    app.add_url_rule('/download_stats', view_func=get_download_stats)
+    socketio.on_event('start_download', handle_start_download)
+    socketio.on_event('start_world_download', handle_start_world_download)
+    socketio.on_event('cancel_download', handle_cancel_download)
+    return app, socketio
+
+
 # --- Add new function: get_tiles_for_bbox ---
 def deg2num(lat_deg, lon_deg, zoom):
     lat_rad = math.radians(lat_deg)
@@ -309,11 +570,17 @@ def deg2num(lat_deg, lon_deg, zoom):
     return xtile, ytile
 
 
+def get_tile_range_for_zoom(west, south, east, north, zoom):
+    """Return (min_x, max_x, min_y, max_y) of the tiles covering the bounding box at a zoom level."""
+    min_x, min_y = deg2num(north, west, zoom)
+    max_x, max_y = deg2num(south, east, zoom)
+    return min_x, max_x, min_y, max_y
+
+
 def get_tiles_for_zoom(west, south, east, north, zoom):
     """Generate list of tiles within the bounding box for a single specified zoom level."""
     all_tiles = []
-    min_x, min_y = deg2num(north, west, zoom)
-    max_x, max_y = deg2num(south, east, zoom)
+    min_x, max_x, min_y, max_y = get_tile_range_for_zoom(west, south, east, north, zoom)
     for x in range(min_x, max_x + 1):
         for y in range(min_y, max_y + 1):
             all_tiles.append(mercantile.Tile(x, y, zoom))
@@ -322,13 +589,16 @@ def get_tiles_for_zoom(west, south, east, north, zoom):
 
 
 # --- Add new function: download_tile_cli ---
-def download_tile_cli(tile, map_style, style_cache_dir, convert_to_8bit, max_retries=3):
-    """Download a single tile for CLI, with retries, converting to 8-bit if specified. Returns (tile_path, status, duration)."""
+def download_tile_cli(tile, map_style, style_cache_dir, convert_to_8bit, max_retries=3, metrics=None):
+    """Download a single tile for CLI, with retries, converting to 8-bit if specified. Returns (tile_path, status, duration).
+
+    When metrics is given, the outcome and latency of every request attempt are recorded in it.
+    """
     tile_dir = style_cache_dir / str(tile.z) / str(tile.x)
-    tile_path = tile_dir / f"{tile.y}.png"
+    tile_path = find_cached_tile(tile_dir, tile.y)
     start_dl_time = time.time()
 
-    if tile_path.exists():
+    if tile_path:
         return tile_path, "skipped", 0
 
     subdomain = random.choice(["a", "b", "c"]) if "{s}" in map_style else ""
@@ -339,24 +609,28 @@ def download_tile_cli(tile, map_style, style_cache_dir, convert_to_8bit, max_ret
         .replace("{y}", str(tile.y))
     )
     headers = {"User-Agent": "MapTileDownloaderCLI/1.0"}
+    host = get_source_host(map_style)
 
     for attempt in range(max_retries):
+        start_attempt_time = time.time()
         try:
             response = requests.get(url, headers=headers, timeout=10)
             duration = (
                 time.time() - start_dl_time
             )
+            if metrics is not None:
+                metrics.record_attempt(
+                    host,
+                    tile.z,
+                    response.status_code not in (200, 404),
+                    time.time() - start_attempt_time,
+                )
             if response.status_code == 200:
-                tile_dir.mkdir(parents=True, exist_ok=True)
-                with open(tile_path, "wb") as f:
-                    f.write(response.content)
+                tile_path = write_tile(tile_dir, tile.y, response.content)
 
                 if convert_to_8bit:
                     try:
-                        with Image.open(tile_path) as img:
-                            if img.mode != "P":
-                                img = img.quantize(colors=256)
-                                img.save(tile_path)
+                        tile_path = convert_tile_to_8bit(tile_path)
                     except Exception as e:
                         print(
                             f"\nWarning: Failed to convert tile {tile.z}/{tile.x}/{tile.y} to 8-bit: {e}"
@@ -382,6 +656,8 @@ def download_tile_cli(tile, map_style, style_cache_dir, convert_to_8bit, max_ret
 
         except requests.RequestException as e:
             duration = time.time() - start_dl_time  # Calculate duration on exception
+            if metrics is not None:
+                metrics.record_attempt(host, tile.z, True, time.time() - start_attempt_time)
             print(
                 f"\nWarning: Tile {tile.z}/{tile.x}/{tile.y} request failed: {e}. Retrying ({attempt + 1}/{max_retries})..."
             )
@@ -397,6 +673,352 @@ def download_tile_cli(tile, map_style, style_cache_dir, convert_to_8bit, max_ret
 
 
 
+# --- Dry-run planning: cache statistics, throughput history and budgets ---
+THROUGHPUT_HISTORY_FILE = CACHE_DIR / 'throughput_history.json'
+THROUGHPUT_HISTORY_LIMIT = 50  # Number of past CLI runs kept in the history file
+DEFAULT_TILE_SIZE_BYTES = 20 * 1024  # Fallback when nothing of a style is cached yet
+DEFAULT_TILE_SECONDS_PER_WORKER = 0.5  # Fallback when no throughput history exists
+SIZE_UNITS = {"": 1, "B": 1, "K": 1024, "KB": 1024, "M": 1024**2, "MB": 1024**2, "G": 1024**3, "GB": 1024**3, "T": 1024**4, "TB": 1024**4}
+
+
+def parse_size(value):
+    """Parse a byte size such as '500MB', '2G' or '1048576' for argparse."""
+    match = re.fullmatch(r"\s*([0-9]*\.?[0-9]+)\s*([a-zA-Z]*)\s*", value)
+    if not match or match.group(2).upper() not in SIZE_UNITS:
+        raise argparse.ArgumentTypeError(f"Invalid size '{value}'. Expected e.g. 500MB, 2GB or a number of bytes.")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def format_bytes(num_bytes):
+    """Format a byte count as a human-readable string."""
+    size = float(num_bytes)
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def format_duration(total_seconds):
+    """Format a number of seconds as 'Xd Xh Xm Xs', dropping leading zero units."""
+    total_seconds = int(total_seconds)
+    days = total_seconds // (24 * 3600)
+    hours = (total_seconds % (24 * 3600)) // 3600
+    minutes = (total_seconds % 3600) // 60
+    seconds = total_seconds % 60
+    if days > 0:
+        return f"{days}d {hours}h {minutes}m {seconds}s"
+    if hours > 0:
+        return f"{hours}h {minutes}m {seconds}s"
+    return f"{minutes}m {seconds}s"
+
+
+def get_cache_stats(style_cache_dir):
+    """Return {zoom: (tile_count, total_bytes)} for the tiles cached in a style directory."""
+    stats = {}
+    if not style_cache_dir.exists():
+        return stats
+    for z_entry in os.scandir(style_cache_dir):
+        if not z_entry.is_dir() or not z_entry.name.isdigit():
+            continue
+        count = 0
+        total_bytes = 0
+        for x_entry in os.scandir(z_entry.path):
+            if not x_entry.is_dir():
+                continue
+            for y_entry in os.scandir(x_entry.path):
+                if y_entry.is_file():
+                    count += 1
+                    total_bytes += y_entry.stat().st_size
+        if count > 0:
+            stats[int(z_entry.name)] = (count, total_bytes)
+    return stats
+
+
+def get_average_tile_size(cache_stats, zoom):
+    """Average cached tile size at a zoom, falling back to the nearest cached zoom or a default."""
+    if not cache_stats:
+        return DEFAULT_TILE_SIZE_BYTES
+    nearest_zoom = min(cache_stats, key=lambda z: (abs(z - zoom), z))
+    count, total_bytes = cache_stats[nearest_zoom]
+    return total_bytes / count
+
+
+def count_cached_tiles_in_range(style_cache_dir, zoom, min_x, max_x, min_y, max_y):
+    """Count cached tiles inside a tile range by scanning the cache rather than enumerating the range."""
+    z_dir = style_cache_dir / str(zoom)
+    if not z_dir.exists():
+        return 0
+    cached = 0
+    for x_entry in os.scandir(z_dir):
+        if not x_entry.is_dir() or not x_entry.name.isdigit():
+            continue
+        if not min_x <= int(x_entry.name) <= max_x:
+            continue
+        for y_entry in os.scandir(x_entry.path):
+            stem = y_entry.name.split(".", 1)[0]
+            if stem.isdigit() and min_y <= int(stem) <= max_y:
+                cached += 1
+    return cached
+
+
+def load_throughput_history():
+    """Load the list of past CLI download runs used for wall-time estimates."""
+    if not THROUGHPUT_HISTORY_FILE.exists():
+        return []
+    try:
+        with open(THROUGHPUT_HISTORY_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def record_throughput(style_names, tiles, num_bytes, seconds, workers):
+    """Append a finished CLI run to the throughput history file."""
+    if tiles <= 0 or seconds <= 0:
+        return
+    history = load_throughput_history()
+    history.append(
+        {
+            "timestamp": time.time(),
+            "styles": list(style_names),
+            "tiles": tiles,
+            "bytes": num_bytes,
+            "seconds": seconds,
+            "workers": workers,
+        }
+    )
+    try:
+        with open(THROUGHPUT_HISTORY_FILE, "w") as f:
+            json.dump(history[-THROUGHPUT_HISTORY_LIMIT:], f)
+    except OSError as e:
+        print(f"Warning: Could not save throughput history: {e}")
+
+
+def get_tiles_per_second(history, style_name, max_workers):
+    """Estimate download rate for a style from past runs, scaled to the given worker count."""
+    runs = [run for run in history if style_name in run["styles"]] or history
+    worker_seconds = sum(run["seconds"] * run["workers"] for run in runs)
+    if worker_seconds > 0:
+        return sum(run["tiles"] for run in runs) / worker_seconds * max_workers
+    return max_workers / DEFAULT_TILE_SECONDS_PER_WORKER
+
+
+def group_tasks_by_style(download_tasks):
+    """Merge CLI tasks that share a style cache into {style_name: {style_cache_dir, ranges, zooms}}."""
+    style_zooms = {}
+    for task in download_tasks:
+        style_plan = style_zooms.setdefault(
+            task["style_name"], {"style_cache_dir": task["style_cache_dir"], "ranges": [], "zooms": set()}
+        )
+        style_plan["ranges"].append(f"{task['min_zoom']}-{task['max_zoom']}")
+        style_plan["zooms"].update(range(task["min_zoom"], task["max_zoom"] + 1))
+    return style_zooms
+
+
+def plan_cli_download(download_tasks, bbox, max_workers):
+    """Print and return an estimate of tiles, transfer, disk and wall time for the CLI tasks."""
+    west, south, east, north = bbox
+    history = load_throughput_history()
+    plan = {"tiles": 0, "uncached_tiles": 0, "transfer_bytes": 0, "disk_bytes": 0, "seconds": 0}
+
+    # Tasks on the same style share one cache, so count each (style, zoom) once
+    style_zooms = group_tasks_by_style(download_tasks)
+
+    print("\n--- Download Plan (estimate) ---")
+    if not history:
+        print("No throughput history yet; wall time uses a default rate.")
+    for style_name, style_plan in style_zooms.items():
+        style_cache_dir = style_plan["style_cache_dir"]
+        cache_stats = get_cache_stats(style_cache_dir)
+        tiles_per_second = get_tiles_per_second(history, style_name, max_workers)
+        style_uncached = 0
+        style_transfer = 0
+        print(f"  Style='{style_name}', Zoom={', '.join(style_plan['ranges'])} (~{tiles_per_second:.1f} tiles/s)")
+        for z in sorted(style_plan["zooms"]):
+            min_x, max_x, min_y, max_y = get_tile_range_for_zoom(west, south, east, north, z)
+            total = max(0, max_x - min_x + 1) * max(0, max_y - min_y + 1)
+            cached = count_cached_tiles_in_range(style_cache_dir, z, min_x, max_x, min_y, max_y) if total else 0
+            uncached = total - cached
+            avg_size = get_average_tile_size(cache_stats, z)
+            plan["tiles"] += total
+            style_uncached += uncached
+            style_transfer += uncached * avg_size
+            print(f"    Zoom {z}: {total} tiles, {cached} cached, {uncached} to fetch (~{format_bytes(avg_size)}/tile)")
+        cached_bytes = sum(total_bytes for _, total_bytes in cache_stats.values())
+        style_seconds = style_uncached / tiles_per_second
+        plan["uncached_tiles"] += style_uncached
+        plan["transfer_bytes"] += style_transfer
+        plan["disk_bytes"] += cached_bytes + style_transfer
+        plan["seconds"] += style_seconds
+        print(f"  Subtotal: {style_uncached} requests, ~{format_bytes(style_transfer)} to transfer, ~{format_duration(style_seconds)}")
+
+    print(f"\nTotal tiles: {plan['tiles']}")
+    print(f"Uncached tiles (requests): {plan['uncached_tiles']}")
+    print(f"Estimated transfer: {format_bytes(plan['transfer_bytes'])}")
+    print(f"Estimated disk footprint after download: {format_bytes(plan['disk_bytes'])}")
+    print(f"Estimated wall time: {format_duration(plan['seconds'])}")
+    print("-" * 40)
+    return plan
+
+
+def check_budgets(plan, args):
+    """Return a list of messages for each budget the plan exceeds."""
+    exceeded = []
+    if args.budget_transfer is not None and plan["transfer_bytes"] > args.budget_transfer:
+        exceeded.append(f"transfer {format_bytes(plan['transfer_bytes'])} exceeds budget {format_bytes(args.budget_transfer)}")
+    if args.budget_disk is not None and plan["disk_bytes"] > args.budget_disk:
+        exceeded.append(f"disk footprint {format_bytes(plan['disk_bytes'])} exceeds budget {format_bytes(args.budget_disk)}")
+    if args.budget_requests is not None and plan["uncached_tiles"] > args.budget_requests:
+        exceeded.append(f"{plan['uncached_tiles']} requests exceeds budget {args.budget_requests}")
+    if args.budget_hours is not None and plan["seconds"] > args.budget_hours * 3600:
+        exceeded.append(f"wall time {format_duration(plan['seconds'])} exceeds budget {args.budget_hours}h")
+    return exceeded
+
+
+# --- Recompression: re-encode cached tiles to WebP, optimised PNG or JPEG ---
+def parse_quality(value):
+    """Parse a --quality value for argparse, accepting integers from 1 to 100."""
+    try:
+        quality = int(value)
+    except ValueError:
+        quality = None
+    if quality is None or not 1 <= quality <= 100:
+        raise argparse.ArgumentTypeError(f"Invalid quality '{value}'. Expected an integer from 1 to 100.")
+    return quality
+
+
+def recompress_tile(tile_path, target_format, quality):
+    """Re-encode one cached tile into target_format, replacing it. Returns (status, old_bytes, new_bytes)."""
+    from PIL import Image
+    tile_path = Path(tile_path)
+    old_size = tile_path.stat().st_size
+    with open(tile_path, "rb") as f:
+        current_format = detect_tile_format(f.read(12))
+    target = TILE_FORMATS[target_format]
+    target_path = tile_path.with_suffix(target["extension"])
+
+    # Re-encoding a lossy tile into the same lossy format only loses quality
+    if current_format == target_format and target_format != "png":
+        if target_path != tile_path:
+            os.replace(tile_path, target_path)
+        return "unchanged", old_size, old_size
+
+    with Image.open(tile_path) as img:
+        img.load()
+        if target_format == "jpeg" and img.mode != "RGB":
+            img = img.convert("RGB")
+        elif target_format == "webp" and img.mode not in ("RGB", "RGBA"):
+            has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+            img = img.convert("RGBA" if has_alpha else "RGB")
+        buffer = io.BytesIO()
+        if target_format == "png":
+            img.save(buffer, "PNG", optimize=True)
+        elif target_format == "webp":
+            img.save(buffer, "WEBP", quality=quality, lossless=quality >= 100)
+        else:
+            img.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+
+    new_size = buffer.tell()
+    # Lossless PNG output is only worth keeping when it is smaller than the original
+    if target_format == "png" and new_size >= old_size:
+        original_path = tile_path.with_suffix(TILE_FORMATS[current_format]["extension"])
+        if original_path != tile_path:
+            os.replace(tile_path, original_path)
+        return "unchanged", old_size, old_size
+
+    temp_path = target_path.with_name(f".{target_path.name}.tmp")
+    with open(temp_path, "wb") as f:
+        f.write(buffer.getvalue())
+    os.replace(temp_path, target_path)
+    if target_path != tile_path:
+        tile_path.unlink()
+    return "recompressed", old_size, new_size
+
+
+def _recompress_tile_job(job):
+    """Process-pool wrapper around recompress_tile that reports errors instead of raising."""
+    tile_path, target_format, quality = job
+    try:
+        return recompress_tile(tile_path, target_format, quality)
+    except Exception as e:
+        print(f"\nWarning: Failed to recompress {tile_path}: {e}")
+        return "failed", 0, 0
+
+
+def get_cached_tile_paths(style_cache_dir, zooms):
+    """Return the paths of every cached tile of a style at the given zoom levels."""
+    tile_paths = []
+    for z in sorted(zooms):
+        z_dir = style_cache_dir / str(z)
+        if not z_dir.exists():
+            continue
+        for x_entry in os.scandir(z_dir):
+            if not x_entry.is_dir():
+                continue
+            for y_entry in os.scandir(x_entry.path):
+                if os.path.splitext(y_entry.name)[1] in TILE_EXTENSIONS and not y_entry.name.startswith("."):
+                    tile_paths.append(y_entry.path)
+    return tile_paths
+
+
+def recompress_tiles(tile_paths, target_format, quality, max_workers=None):
+    """Re-encode the given tiles using all CPU cores. Returns (counts, old_bytes, new_bytes)."""
+    from concurrent.futures import ProcessPoolExecutor
+    jobs = [(str(tile_path), target_format, quality) for tile_path in tile_paths]
+    counts = {"recompressed": 0, "unchanged": 0, "failed": 0}
+    old_total = 0
+    new_total = 0
+    if not jobs:
+        return counts, old_total, new_total
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for processed, (status, old_size, new_size) in enumerate(
+            executor.map(_recompress_tile_job, jobs, chunksize=64), start=1
+        ):
+            counts[status] += 1
+            old_total += old_size
+            new_total += new_size
+            print(f"\r  Recompressing: {processed}/{len(jobs)}   ", end="")
+    print()
+    return counts, old_total, new_total
+
+
+def print_recompress_result(counts, old_total, new_total):
+    """Print the outcome counts and size change of a recompression pass."""
+    print(
+        f"  {counts['recompressed']} recompressed, {counts['unchanged']} unchanged, {counts['failed']} failed; "
+        f"{format_bytes(old_total)} -> {format_bytes(new_total)}"
+    )
+
+
+def run_cli_recompress(download_tasks, target_format, quality, dry_run=False):
+    """Recompress the whole cache of each task style once, or only list the work if dry_run."""
+    print(f"\n--- Recompressing Tiles to {target_format.upper()} (quality {quality}) ---")
+    for style_name, style_plan in group_tasks_by_style(download_tasks).items():
+        print(f"Style '{style_name}' ({', '.join(style_plan['ranges'])}):")
+        tile_paths = get_cached_tile_paths(style_plan["style_cache_dir"], style_plan["zooms"])
+        if dry_run:
+            total_bytes = sum(os.path.getsize(tile_path) for tile_path in tile_paths)
+            print(f"  {len(tile_paths)} cached tiles ({format_bytes(total_bytes)}) would be recompressed")
+            continue
+        print_recompress_result(*recompress_tiles(tile_paths, target_format, quality))
+
+
+def print_metrics_summary(summary):
+    """Print per-host and per-zoom latency percentiles and error rates over a whole finished CLI run."""
+    def format_latency(value):
+        return f"<={value}s" if value is not None else f">{LATENCY_BUCKETS[-1]}s"
+
+    for kind, label in (("hosts", "Host"), ("zooms", "Zoom")):
+        for key, group in sorted(summary[kind].items(), key=lambda item: (len(item[0]), item[0])):
+            p50 = TileMetrics.percentile(group["total_histogram"], 0.5)
+            p90 = TileMetrics.percentile(group["total_histogram"], 0.9)
+            print(
+                f"  {label} {key}: {group['requests']} requests, p50 {format_latency(p50)}, "
+                f"p90 {format_latency(p90)}, errors {group['errors'] / group['requests'] * 100:.1f}%"
+            )
+
+
 def run_cli_download(args):
     """Orchestrates the tile download process based on CLI arguments, processing multiple styles/zooms in parallel."""
     print("Running in Command-Line Interface mode (Parallel).")
@@ -437,11 +1059,12 @@ def run_cli_download(args):
                 )
                 sys.exit(1)
 
-        if style_name not in MAP_SOURCES:
+        map_sources = load_map_sources()
+        if style_name not in map_sources:
             print(
                 f"Error: Map style '{style_name}' not found in config/map_sources.json."
             )
-            print(f"Available styles: {', '.join(MAP_SOURCES.keys())}")
+            print(f"Available styles: {', '.join(map_sources.keys())}")
             sys.exit(1)
 
         if min_zoom_task < 0 or max_zoom_task > 19 or min_zoom_task > max_zoom_task:
@@ -454,19 +1077,44 @@ def run_cli_download(args):
             "style_name": style_name,
             "min_zoom": min_zoom_task,
             "max_zoom": max_zoom_task,
-            "map_style_url": MAP_SOURCES[style_name],
+            "map_style_url": map_sources[style_name],
             "style_cache_dir": get_style_cache_dir(style_name),
             "tiles_for_task": {},
         }
-        task_details["style_cache_dir"].mkdir(exist_ok=True)
+        if not args.dry_run:
+            task_details["style_cache_dir"].mkdir(exist_ok=True)
         download_tasks.append(task_details)
 
+    if args.recompress_only:
+        if not args.recompress:
+            print("Error: --recompress-only requires --recompress FORMAT.")
+            sys.exit(1)
+        run_cli_recompress(download_tasks, args.recompress, args.quality, dry_run=args.dry_run)
+        if args.dry_run:
+            print("Dry run: no tiles were recompressed.")
+        return
+
     if not args.bbox or len(args.bbox) != 4:
         print(
             "Error: Bounding box (--bbox WEST SOUTH EAST NORTH) is required and must contain 4 values."
         )
         sys.exit(1)
     west, south, east, north = args.bbox
+    max_workers = 10
+
+    budgets = (args.budget_transfer, args.budget_disk, args.budget_requests, args.budget_hours)
+    if args.dry_run or any(budget is not None for budget in budgets):
+        plan = plan_cli_download(download_tasks, args.bbox, max_workers)
+        exceeded = check_budgets(plan, args)
+        for message in exceeded:
+            level = "Error" if args.budget_action == "refuse" else "Warning"
+            print(f"{level}: Budget exceeded: {message}")
+        if args.dry_run:
+            print("Dry run: no tiles were downloaded.")
+            sys.exit(1 if exceeded and args.budget_action == "refuse" else 0)
+        if exceeded and args.budget_action == "refuse":
+            print("Refusing to start download. Use --budget-action warn to proceed anyway.")
+            sys.exit(1)
 
     print("Calculating tiles and preparing download jobs...")
     all_tile_jobs = []
@@ -507,9 +1155,10 @@ def run_cli_download(args):
     overall_downloaded = 0
     overall_skipped = 0
     overall_failed = 0
+    overall_downloaded_bytes = 0
+    downloaded_tile_paths = []
     overall_start_time = time.time()
-    overall_recent_download_times = collections.deque(maxlen=100)
-    max_workers = 10
+    metrics = TileMetrics()
 
     print(f"Starting parallel download with {max_workers} workers...")
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
@@ -520,6 +1169,7 @@ def run_cli_download(args):
                 job["map_style_url"],
                 job["style_cache_dir"],
                 job["convert_8bit"],
+                metrics=metrics,
             ): job
             for job in all_tile_jobs
         }
@@ -529,62 +1179,31 @@ def run_cli_download(args):
             try:
                 tile_path, status, duration = future.result()
                 overall_processed += 1
+                # Cached tiles return a zero duration; everything else needed a request
+                metrics.record_tile(network_bound=duration > 0)
 
                 if status == "downloaded":
                     overall_downloaded += 1
-                    overall_recent_download_times.append(duration)
+                    overall_downloaded_bytes += tile_path.stat().st_size
+                    downloaded_tile_paths.append(tile_path)
                 elif status == "skipped":
                     overall_skipped += 1
                 elif status == "failed":
                     overall_failed += 1
 
-                elapsed_time = time.time() - overall_start_time
                 progress_percent = (
                     (overall_processed / total_tiles_across_all_tasks) * 100
                     if total_tiles_across_all_tasks > 0
                     else 0
                 )
-                eta_str = "Calculating..."
-
-                if len(overall_recent_download_times) > 0:
-                    if (
-                        len(overall_recent_download_times)
-                        >= overall_recent_download_times.maxlen / 2
-                    ):
-                        avg_time_per_tile = sum(overall_recent_download_times) / len(
-                            overall_recent_download_times
-                        )
-                    elif overall_processed > 0 and elapsed_time > 0:
-                        effective_processed_for_time = (
-                            overall_downloaded + overall_failed
-                        )
-                        if effective_processed_for_time > 0:
-                            avg_time_per_tile = (
-                                elapsed_time / effective_processed_for_time
-                            )
-                        else:
-                            avg_time_per_tile = 0
-                    else:
-                        avg_time_per_tile = 0
-
-                    if avg_time_per_tile > 0:
-                        remaining_tiles = (
-                            total_tiles_across_all_tasks - overall_processed
-                        )
-                        remaining_time = avg_time_per_tile * remaining_tiles
-                        eta_total_seconds = int(remaining_time)
-                        eta_days = eta_total_seconds // (24 * 3600)
-                        eta_hours = (eta_total_seconds % (24 * 3600)) // 3600
-                        eta_minutes = (eta_total_seconds % 3600) // 60
-                        eta_seconds = eta_total_seconds % 60
-                        if eta_days > 0:
-                            eta_str = f"{eta_days}d {eta_hours}h {eta_minutes}m {eta_seconds}s"
-                        elif eta_hours > 0:
-                            eta_str = f"{eta_hours}h {eta_minutes}m {eta_seconds}s"
-                        else:
-                            eta_str = f"{eta_minutes}m {eta_seconds}s"
-                    else:
-                        eta_str = "0m 0s"
+                eta_seconds = metrics.eta_seconds(
+                    total_tiles_across_all_tasks - overall_processed
+                )
+                eta_str = (
+                    format_duration(eta_seconds)
+                    if eta_seconds is not None
+                    else "Calculating..."
+                )
 
                 print(
                     f"\rOverall Progress: {progress_percent:.1f}% [{overall_processed}/{total_tiles_across_all_tasks}] | ETA: {eta_str}   ",
@@ -598,18 +1217,35 @@ def run_cli_download(args):
                 )
                 overall_processed += 1
                 overall_failed += 1
+                metrics.record_tile(network_bound=True)
 
     print()
+    record_throughput(
+        [task["style_name"] for task in download_tasks],
+        overall_downloaded,
+        overall_downloaded_bytes,
+        time.time() - overall_start_time,
+        max_workers,
+    )
     print("\n--- Overall Download Summary ---")
     print(f"Total tiles processed: {overall_processed}")
     print(f"Successfully downloaded: {overall_downloaded}")
     print(f"Skipped (already cached or 404): {overall_skipped}")
+    print(f"Transferred: {format_bytes(overall_downloaded_bytes)}")
     print(f"Failed: {overall_failed}")
+    print_metrics_summary(metrics.summary())
     print("-" * 40)
 
     if overall_failed > 0:
         print("Download process completed with errors.")
 
+    if args.recompress:
+        # Only this run's downloads; use --recompress-only to convert the rest of an existing cache
+        print(
+            f"\n--- Recompressing {len(downloaded_tile_paths)} Downloaded Tiles to {args.recompress.upper()} (quality {args.quality}) ---"
+        )
+        print_recompress_result(*recompress_tiles(downloaded_tile_paths, args.recompress, args.quality))
+
     print("\n--- Creating Zip Files ---")
     zip_success_count = 0
     for task in download_tasks:
@@ -647,7 +1283,8 @@ def run_cli_download(args):
     print("\nCLI download process finished.")
 
 
-if __name__ == '__main__':
+def main():
+    """Parse command-line arguments and run either the CLI download or the web server."""
     parser = argparse.ArgumentParser(description="Map Tile Downloader - Web UI or CLI")
     parser.add_argument("--cli", action="store_true", help="Force run in CLI mode.")
     parser.add_argument(
@@ -679,6 +1316,57 @@ if __name__ == '__main__':
         action="store_true",
         help="Convert downloaded tiles to 8-bit palette PNG.",
     )
+    parser.add_argument(
+        "--recompress",
+        choices=sorted(TILE_FORMATS),
+        help="Re-encode cached tiles of each task to this format after downloading, using all CPU cores.",
+    )
+    parser.add_argument(
+        "--quality",
+        type=parse_quality,
+        default=80,
+        help="Quality (1-100) for --recompress webp/jpeg; 100 gives lossless WebP (default: 80).",
+    )
+    parser.add_argument(
+        "--recompress-only",
+        action="store_true",
+        help="Only recompress the existing cache for the --downloads tasks; no --bbox or download needed.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Estimate requests, transfer, disk footprint and wall time without downloading.",
+    )
+    parser.add_argument(
+        "--budget-transfer",
+        type=parse_size,
+        metavar="SIZE",
+        help="Maximum estimated download volume, e.g. 500MB or 2GB.",
+    )
+    parser.add_argument(
+        "--budget-disk",
+        type=parse_size,
+        metavar="SIZE",
+        help="Maximum estimated cache size of the styles after the download.",
+    )
+    parser.add_argument(
+        "--budget-requests",
+        type=int,
+        metavar="N",
+        help="Maximum number of uncached tiles to request.",
+    )
+    parser.add_argument(
+        "--budget-hours",
+        type=float,
+        metavar="HOURS",
+        help="Maximum estimated wall time in hours.",
+    )
+    parser.add_argument(
+        "--budget-action",
+        choices=["refuse", "warn"],
+        default="refuse",
+        help="What to do when a budget is exceeded (default: refuse).",
+    )
 
     args = parser.parse_args()
 
@@ -691,4 +1379,9 @@ if __name__ == '__main__':
         CACHE_DIR.mkdir(exist_ok=True)
         CONFIG_DIR.mkdir(exist_ok=True)
         DOWNLOADS_DIR.mkdir(exist_ok=True)
+        create_web_app()
         socketio.run(app, debug=True, use_reloader=False)
+
+
+if __name__ == '__main__':
+    main()
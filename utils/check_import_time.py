@@ -0,0 +1,68 @@
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+# Modules the CLI path must not load; they belong to the web server, geometry or recompression paths
+FORBIDDEN_MODULES = ["flask", "flask_socketio", "shapely", "PIL", "multiprocessing"]
+IMPORT_TIME_BUDGET_SECONDS = 0.5
+
+SRC_DIR = Path(__file__).parent.parent / 'src'
+
+# Runs in a fresh interpreter so modules loaded by this script do not leak into the measurement
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {src_dir!r})
+start = time.perf_counter()
+import TileDL
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+def check_import_time(budget_seconds=IMPORT_TIME_BUDGET_SECONDS):
+    """
+    Imports src/TileDL.py in a subprocess and checks the CLI start-up budget.
+
+    Args
+        - budget_seconds: Maximum time allowed for importing TileDL.
+
+    Returns
+        - A list of problems found, empty when the budget is met.
+    """
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(src_dir=str(SRC_DIR))],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return [f"Importing TileDL failed:\n{result.stderr}"]
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+
+    problems = []
+    for forbidden in FORBIDDEN_MODULES:
+        loaded = [name for name in probe["modules"] if name == forbidden or name.startswith(forbidden + '.')]
+        if loaded:
+            problems.append(f"'{forbidden}' is imported at start-up ({len(loaded)} modules)")
+    if probe["seconds"] > budget_seconds:
+        problems.append(f"Import took {probe['seconds'] * 1000:.0f} ms, budget is {budget_seconds * 1000:.0f} ms")
+    print(f"TileDL import time: {probe['seconds'] * 1000:.0f} ms (budget {budget_seconds * 1000:.0f} ms)")
+    return problems
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check the CLI import-time budget of src/TileDL.py")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=IMPORT_TIME_BUDGET_SECONDS,
+        help=f"Maximum import time in seconds (default: {IMPORT_TIME_BUDGET_SECONDS}).",
+    )
+    args = parser.parse_args()
+
+    problems = check_import_time(args.budget)
+    for problem in problems:
+        print(f"Error: {problem}")
+    if problems:
+        sys.exit(1)
+    print("Import-time budget met.")